@@ -9,42 +9,162 @@ Author: Security Engineer
 Date: January 2026
 """
 
-import json
-import requests
+import asyncio
+import hashlib
+import io
+import random
+import re
 import logging
-from typing import Dict, Any, Optional
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, AsyncIterator, Awaitable, Callable, Iterator, List, Optional
+
+import httpx
+import orjson
+from openai import APIConnectionError, APIError, APIStatusError, AsyncAzureOpenAI, AzureOpenAI
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
 
 # ============================================================================
 # CONFIGURATION - AZURE CREDENTIALS
 # ============================================================================
 
-# Your Azure OpenAI API Key (store securely in environment variables in production)
+# All values are read from environment variables. Only the API key is required;
+# the rest default to the values extracted from the sample endpoint.
+
+# Your Azure OpenAI API Key (environment variable: AZURE_OPENAI_API_KEY)
 # Retrieve from: Azure Portal > Your Resource > Keys and Endpoint > Show Keys
-AZURE_API_KEY = "your-azure-openai-api-key-here"
+AZURE_API_KEY = os.getenv("AZURE_OPENAI_API_KEY", "")
 
-# Your Azure OpenAI Resource Name (extracted from endpoint)
+# Your Azure OpenAI Resource Name (environment variable: AZURE_RESOURCE_NAME)
 # From your endpoint: https://ad-jo-mg8x3t2p-eastus2.cognitiveservices.azure.com/...
 # Resource Name: ad-jo-mg8x3t2p
-AZURE_RESOURCE_NAME = "ad-jo-mg8x3t2p"
+AZURE_RESOURCE_NAME = os.getenv("AZURE_RESOURCE_NAME", "ad-jo-mg8x3t2p")
 
-# Your Azure Region (extracted from endpoint)
+# Your Azure Region (environment variable: AZURE_REGION)
 # From your endpoint: https://ad-jo-mg8x3t2p-eastus2.cognitiveservices.azure.com/...
 # Region: eastus2
-AZURE_REGION = "eastus2"
+AZURE_REGION = os.getenv("AZURE_REGION", "eastus2")
 
-# Your deployment name (extracted from endpoint)
+# Your deployment name (environment variable: AZURE_DEPLOYMENT_NAME)
 # From your endpoint: .../deployments/gpt-5/...
 # Deployment Name: gpt-5
-AZURE_DEPLOYMENT_NAME = "gpt-5"
+AZURE_DEPLOYMENT_NAME = os.getenv("AZURE_DEPLOYMENT_NAME", "gpt-5")
+
+# Batch deployment name (environment variable: AZURE_BATCH_DEPLOYMENT_NAME)
+# The Batch API only accepts deployments created with a Global Batch or Data Zone Batch
+# deployment type; defaults to AZURE_DEPLOYMENT_NAME when that deployment is batch-enabled
+AZURE_BATCH_DEPLOYMENT_NAME = os.getenv("AZURE_BATCH_DEPLOYMENT_NAME", AZURE_DEPLOYMENT_NAME)
 
-# API version (extracted from endpoint)
+# API version (environment variable: AZURE_API_VERSION)
 # From your endpoint: ?api-version=2025-01-01-preview
 # API Version: 2025-01-01-preview
-API_VERSION = "2025-01-01-preview"
+API_VERSION = os.getenv("AZURE_API_VERSION", "2025-01-01-preview")
 
 # Construct the full endpoint URL
 AZURE_ENDPOINT_URL = f"https://{AZURE_RESOURCE_NAME}-{AZURE_REGION}.cognitiveservices.azure.com"
 
+# Chat Completions endpoint and request headers (derived once from the configuration above)
+_API_URL = f"{AZURE_ENDPOINT_URL}/openai/deployments/{AZURE_DEPLOYMENT_NAME}/chat/completions?api-version={API_VERSION}"
+
+_HEADERS = {
+    "Content-Type": "application/json",
+    "api-key": AZURE_API_KEY
+}
+
+# Request timeout in seconds (must be less than Foundry's 30-second timeout)
+REQUEST_TIMEOUT = 25
+
+# Attempts per Azure OpenAI call (429/5xx and connection errors are retried). REST
+# and SDK calls share one retry loop, so all attempts fit in REQUEST_TIMEOUT.
+MAX_ATTEMPTS = 3
+
+# HTTP status codes worth retrying
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+# Maximum in-flight Azure OpenAI requests when analyzing many events concurrently
+# (environment variable: AZURE_MAX_CONCURRENCY)
+MAX_CONCURRENT_REQUESTS = max(1, int(os.getenv("AZURE_MAX_CONCURRENCY", "10")))
+
+# Requests per minute the async path may start; match the deployment's RPM quota
+# (environment variable: AZURE_MAX_RPM; 0 disables the limiter)
+MAX_REQUESTS_PER_MINUTE = int(os.getenv("AZURE_MAX_RPM", "600"))
+
+# Number of analyses kept in the in-process cache (repeat detections skip Azure)
+ANALYSIS_CACHE_SIZE = 512
+
+# Persistent analysis cache shared across processes and warm restarts. Disabled
+# unless set; the file holds detection data and is served back as trusted
+# analyses, so it is created owner-only (0600) in an owner-only (0700) directory
+# (environment variable: ANALYSIS_CACHE_PATH)
+ANALYSIS_CACHE_PATH = os.getenv("ANALYSIS_CACHE_PATH", "")
+
+# Seconds a persisted analysis stays valid
+ANALYSIS_CACHE_TTL = 86400
+
+# Send a 1-token request at import so the first handler call finds a warm
+# connection pool (environment variable: AZURE_WARMUP=1 to enable)
+WARMUP_ON_IMPORT = os.getenv("AZURE_WARMUP", "") == "1"
+
+# Maximum detections packed into one batched Azure OpenAI request
+MAX_BATCH_SIZE = 10
+
+# Share of the context window a batched request (prompt + completions) may fill
+BATCH_CONTEXT_FRACTION = 0.8
+
+# Structured output for batched requests: {"analyses": ["...", ...]}
+JSON_RESPONSE_FORMAT = {"type": "json_object"}
+
+# Conservative generation speed of the deployment, used to cap a batched
+# request's completion to what can stream back within the request deadline
+# (environment variable: AZURE_COMPLETION_TOKENS_PER_SECOND)
+COMPLETION_TOKENS_PER_SECOND = float(os.getenv("AZURE_COMPLETION_TOKENS_PER_SECOND", "60"))
+
+# ============================================================================
+# MODEL CONFIGURATION
+# ============================================================================
+
+SYSTEM_PROMPT = "You are a cybersecurity expert specializing in threat analysis and incident response."
+
+# Shared system message; only the user message is allocated per request
+_SYSTEM_MSG = {
+    "role": "system",
+    "content": SYSTEM_PROMPT
+}
+
+# Sampling parameters shared by the REST and SDK code paths. Deterministic
+# sampling keeps repeat analyses stable, and analyses rarely need more than
+# 800 tokens; events can raise the limit with "max_tokens" for long-form output.
+COMPLETION_PARAMS = {
+    "temperature": 0.0,
+    "max_tokens": 800,
+    "top_p": 1.0,
+    "frequency_penalty": 0,
+    "presence_penalty": 0
+}
+
+# Context window of the deployment (environment variable: AZURE_MODEL_CONTEXT_TOKENS).
+# max_tokens is clamped so prompt + completion fit, and prompts that cannot fit
+# are not sent, avoiding oversized requests that Azure rejects or throttles.
+MODEL_CONTEXT_TOKENS = int(os.getenv("AZURE_MODEL_CONTEXT_TOKENS", "8192"))
+
+# Tokens reserved for message framing when computing the completion budget
+CONTEXT_SAFETY_MARGIN = 64
+
+# Smallest useful completion budget; prompts leaving less room than this fail
+# without calling Azure (a smaller requested max_tokens is still honoured)
+MIN_COMPLETION_TOKENS = 256
+
+# tiktoken encoding used for token counts; without tiktoken, counts are
+# estimated conservatively from the character length
+TOKEN_ENCODING = "o200k_base"
+
 # ============================================================================
 # LOGGING CONFIGURATION
 # ============================================================================
@@ -52,6 +172,68 @@ AZURE_ENDPOINT_URL = f"https://{AZURE_RESOURCE_NAME}-{AZURE_REGION}.cognitiveser
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
 
+
+class LazyJson:
+    """
+    Log argument that serializes its value to JSON only if the record is emitted.
+    
+    Passing ``LazyJson(payload)`` instead of a pre-serialized string keeps
+    filtered-out log calls from paying for serialization of large payloads.
+    """
+    
+    __slots__ = ("value",)
+    
+    def __init__(self, value: Any):
+        self.value = value
+    
+    def __str__(self) -> str:
+        return orjson.dumps(self.value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+
+# ============================================================================
+# HTTP CLIENT (Shared connection pool for Azure OpenAI REST calls)
+# ============================================================================
+
+def create_http_client() -> httpx.Client:
+    """
+    Creates an HTTP/2 client with a keep-alive connection pool.
+    
+    HTTP/2 multiplexes concurrent requests over a single TCP/TLS connection,
+    and reusing the client across invocations means only the first request
+    pays the handshake. Retries are handled by post_with_retry so they stay
+    within the request time budget.
+    
+    Returns:
+        httpx.Client: Configured client
+    """
+    
+    return httpx.Client(
+        http2=True,
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=16),
+        timeout=REQUEST_TIMEOUT
+    )
+
+
+def create_async_http_client() -> httpx.AsyncClient:
+    """
+    Creates the HTTP/2 transport for the async Azure OpenAI client.
+    
+    Concurrent requests are multiplexed over one or two connections instead
+    of opening one TCP/TLS connection per in-flight request. The pool is bound
+    to the running event loop, so it is created per async client.
+    
+    Returns:
+        httpx.AsyncClient: Configured async client
+    """
+    
+    return httpx.AsyncClient(
+        http2=True,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+        timeout=REQUEST_TIMEOUT
+    )
+
+
+_CLIENT = create_http_client()
+
 # ============================================================================
 # MAIN HANDLER FUNCTION (Entry point for Foundry)
 # ============================================================================
@@ -60,68 +242,374 @@ def handler(event: Dict[str, Any]) -> Dict[str, Any]:
     """
     Main handler function called by Falcon Foundry.
     
+    Dispatches the event through _EVENT_HANDLERS by its mode (see
+    get_event_mode); detections default to a real-time analysis.
+    
     Args:
-        event (Dict[str, Any]): JSON payload containing Detection or Incident details
+        event (Dict[str, Any]): JSON payload containing Detection or Incident details.
+            Set ``"mode": "batch"`` or ``"priority": "bulk"`` to use the Batch API
+            (see batch_api_handler). ``{"events": [...]}`` analyzes several
+            detections in real time (see multi_event_handler).
         
     Returns:
         Dict[str, Any]: Response with analysis results or error message
     """
     
     try:
-        logger.info("Handler invoked with event: %s", json.dumps(event, indent=2))
+        logger.info("Handler invoked with event: %s", LazyJson(event))
+        
+        return _EVENT_HANDLERS[get_event_mode(event)](event)
+        
+    except Exception as e:
+        logger.error("Error in handler: %s", str(e), exc_info=True)
+        return error_response(f"Exception occurred: {str(e)}")
+
+
+def realtime_handler(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Analyzes a single detection with a real-time Azure OpenAI request.
+    
+    Args:
+        event (Dict[str, Any]): JSON payload containing Detection or Incident details
         
+    Returns:
+        Dict[str, Any]: Response with analysis results or error message
+    """
+    
+    try:
         # Extract relevant fields from the payload
         extracted_data = extract_detection_data(event)
         
         if not extracted_data:
-            return {
-                "status": "error",
-                "message": "Unable to extract detection/incident data from payload",
-                "analysis": ""
-            }
+            return error_response("Unable to extract detection/incident data from payload")
         
-        logger.info("Extracted data: %s", json.dumps(extracted_data, indent=2))
+        logger.info("Extracted data: %s", LazyJson(extracted_data))
         
         # Prepare the prompt for Azure OpenAI
         prompt = build_analysis_prompt(extracted_data)
         
         # Send request to Azure OpenAI
-        analysis_response = call_azure_openai(prompt)
+        analysis_response = cached_call_azure_openai(prompt, get_max_tokens_override(event))
         
-        if not analysis_response:
-            return {
-                "status": "error",
-                "message": "Failed to get response from Azure OpenAI",
-                "analysis": ""
-            }
+        return build_handler_response(analysis_response, extracted_data)
+        
+    except PromptTooLargeError as e:
+        return error_response(str(e))
+    except Exception as e:
+        logger.error("Error in realtime handler: %s", str(e), exc_info=True)
+        return error_response(f"Exception occurred: {str(e)}")
+
+# ============================================================================
+# BATCH HANDLER FUNCTION (Many detections in one request)
+# ============================================================================
+
+def handler_batch(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Analyzes several detections with as few Azure OpenAI requests as possible.
+    
+    Detections are packed into groups of up to MAX_BATCH_SIZE (see
+    pack_batches). Each group shares one copy of the analysis instructions
+    and is answered as a JSON array, so K detections cost one HTTP round trip
+    and one request against the RPM quota.
+    
+    All requests share one REQUEST_TIMEOUT deadline. A group's completion is
+    capped to what can stream back before it (the model is then asked for
+    shorter analyses), and detections whose group answer is truncated or
+    cannot be parsed are retried one by one while time remains.
+    
+    Args:
+        events (List[Dict[str, Any]]): Detection/Incident payloads
+        
+    Returns:
+        List[Dict[str, Any]]: One handler response per event, in input order
+    """
+    
+    deadline = time.monotonic() + REQUEST_TIMEOUT
+    responses: List[Optional[Dict[str, Any]]] = [None] * len(events)
+    batch = []
+    
+    try:
+        for index, event in enumerate(events):
+            extracted_data = extract_detection_data(event)
+            
+            if not extracted_data:
+                responses[index] = error_response("Unable to extract detection/incident data from payload")
+                continue
+            
+            # A bad override only fails its own event
+            try:
+                max_tokens = get_max_tokens_override(event) or COMPLETION_PARAMS["max_tokens"]
+            except ValueError as e:
+                responses[index] = error_response(str(e))
+                continue
+            
+            batch.append((index, extracted_data, build_detection_info(extracted_data), max_tokens))
         
-        logger.info("Analysis response received: %s", analysis_response)
+        for group in pack_batches(batch):
+            requested = sum(max_tokens for _, _, _, max_tokens in group)
+            budget = min(requested, time_budget_tokens(deadline))
+            
+            if budget < MIN_COMPLETION_TOKENS:
+                for index, _, _, _ in group:
+                    responses[index] = error_response("Request time budget exhausted before this detection was analyzed")
+                continue
+            
+            # A capped budget is shared out so every analysis fits in the JSON answer
+            max_words = budget * 3 // (4 * len(group)) if budget < requested else None
+            
+            try:
+                analyses = parse_batch_response(
+                    call_azure_openai(
+                        build_batch_prompt([info for _, _, info, _ in group], max_words),
+                        max_tokens=budget,
+                        response_format=JSON_RESPONSE_FORMAT,
+                        deadline=deadline
+                    ),
+                    len(group)
+                )
+            except PromptTooLargeError:
+                analyses = [None] * len(group)
+            
+            for (index, extracted_data, _, max_tokens), analysis in zip(group, analyses):
+                if analysis is None:
+                    try:
+                        analysis = cached_call_azure_openai(
+                            build_analysis_prompt(extracted_data), max_tokens, deadline
+                        )
+                    except PromptTooLargeError as e:
+                        responses[index] = error_response(str(e))
+                        continue
+                
+                responses[index] = build_handler_response(analysis, extracted_data)
+        
+        return responses
+        
+    except Exception as e:
+        logger.error("Error in batch handler: %s", str(e), exc_info=True)
+        return [response or error_response(f"Exception occurred: {str(e)}") for response in responses]
+
+# ============================================================================
+# BATCH API HANDLER FUNCTION (Non-interactive backlogs)
+# ============================================================================
+
+def batch_api_handler(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Submits or polls an Azure OpenAI Batch API job.
+    
+    The Batch API completes within 24 hours at a lower price and outside the
+    real-time RPM/TPM limits, which suits historical detection backlogs,
+    bulk backfills and scheduled incident sweeps. Events are routed here by
+    ``"mode": "batch"`` or ``"priority": "bulk"``:
+    
+    - ``{"mode": "batch", "batch_id": "..."}`` polls an existing job
+    - ``{"mode": "batch", "events": [...]}`` submits the listed detections
+    - ``{"mode": "batch", ...detection fields}`` submits the event itself
+    
+    Args:
+        event (Dict[str, Any]): Batch request payload
+        
+    Returns:
+        Dict[str, Any]: Submission or poll result, or error message
+    """
+    
+    try:
+        if event.get("batch_id"):
+            return poll_batch(event["batch_id"])
+        
+        batch_id = submit_batch(event.get("events") or [event])
+        
+        if not batch_id:
+            return error_response("No detection/incident data to submit to the Batch API")
         
-        # Return successful response
         return {
             "status": "success",
-            "message": "Analysis completed successfully",
-            "analysis": analysis_response,
-            "extracted_data": extracted_data
+            "message": "Batch submitted successfully",
+            "analysis": "",
+            "batch_id": batch_id
         }
         
+    except APIError as e:
+        logger.error("Azure OpenAI Batch API error: %s", str(e))
+        return error_response(f"Azure OpenAI Batch API error: {str(e)}")
     except Exception as e:
-        logger.error("Error in handler: %s", str(e), exc_info=True)
-        return {
-            "status": "error",
-            "message": f"Exception occurred: {str(e)}",
-            "analysis": ""
-        }
+        logger.error("Error in batch API handler: %s", str(e), exc_info=True)
+        return error_response(f"Exception occurred: {str(e)}")
+
+# ============================================================================
+# MULTI-EVENT HANDLER FUNCTIONS (Several detections in one invocation)
+# ============================================================================
+
+def multi_event_handler(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Analyzes the detections listed under ``events`` in real time.
+    
+    - ``{"events": [...]}`` or ``{"mode": "concurrent", "events": [...]}``
+      sends one request per detection concurrently (see handle_many)
+    - ``{"mode": "packed", "events": [...]}`` packs the detections into as
+      few requests as possible (see handler_batch)
+    
+    Args:
+        event (Dict[str, Any]): Payload with an ``events`` list
+        
+    Returns:
+        Dict[str, Any]: ``results`` holds one handler response per event, in input order
+    """
+    
+    events = event.get("events")
+    
+    if not isinstance(events, list) or not events:
+        return error_response("Expected a non-empty 'events' list")
+    
+    # Entries that are not objects fail extraction like any other empty payload
+    events = [e if isinstance(e, dict) else {} for e in events]
+    
+    results = handler_batch(events) if event.get("mode") == "packed" else handle_many(events)
+    
+    return {
+        "status": "success",
+        "message": f"Analyzed {len(results)} events",
+        "analysis": "",
+        "results": results
+    }
+
+# ============================================================================
+# EVENT ROUTING
+# ============================================================================
+
+# Event mode -> handler for events of that mode
+_EVENT_HANDLERS = {
+    "realtime": realtime_handler,
+    "batch": batch_api_handler,
+    "concurrent": multi_event_handler,
+    "packed": multi_event_handler
+}
+
+# Event priority -> mode, for events that do not set a mode
+_PRIORITY_MODES = {
+    "bulk": "batch"
+}
+
+# Handler control keys; never part of the detection data
+_ROUTING_KEYS = ("mode", "batch_id", "events", "max_tokens")
+
+# ============================================================================
+# ASYNC HANDLER FUNCTIONS (Concurrent analysis of many events)
+# ============================================================================
+
+async def async_handler(event: Dict[str, Any], client: AsyncAzureOpenAI,
+                        limiter: Optional["RateLimiter"] = None,
+                        deadline: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Async variant of handler that awaits Azure OpenAI instead of blocking.
+    
+    Args:
+        event (Dict[str, Any]): JSON payload containing Detection or Incident details
+        client (AsyncAzureOpenAI): Shared async client used for the request
+        limiter (Optional[RateLimiter]): Shared request rate limiter (cache hits
+            do not consume it)
+        deadline (Optional[float]): time.monotonic() by which the event must be
+            answered (defaults to REQUEST_TIMEOUT from now)
+        
+    Returns:
+        Dict[str, Any]: Response with analysis results or error message
+    """
+    
+    try:
+        extracted_data = extract_detection_data(event)
+        
+        if not extracted_data:
+            return error_response("Unable to extract detection/incident data from payload")
+        
+        prompt = build_analysis_prompt(extracted_data)
+        
+        max_tokens = get_max_tokens_override(event)
+        cache_key = analysis_cache_key(prompt, max_tokens)
+        # The persistent cache does blocking SQLite I/O; keep it off the event loop
+        analysis_response = await asyncio.to_thread(get_cached_analysis, cache_key)
+        
+        if analysis_response is None:
+            analysis_response = await async_call_azure_openai(client, prompt, max_tokens, limiter, deadline)
+            await asyncio.to_thread(cache_analysis, cache_key, analysis_response)
+        
+        return build_handler_response(analysis_response, extracted_data)
+        
+    except (PromptTooLargeError, RateLimitTimeoutError) as e:
+        return error_response(str(e))
+    except Exception as e:
+        logger.error("Error in async handler: %s", str(e), exc_info=True)
+        return error_response(f"Exception occurred: {str(e)}")
+
+
+async def async_handle_many(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Analyzes many events concurrently over a single async Azure OpenAI client.
+    
+    At most MAX_CONCURRENT_REQUESTS events are in flight at once, and new
+    requests start no faster than MAX_REQUESTS_PER_MINUTE, so large batches
+    stay within the deployment's quota instead of cascading into 429s.
+    
+    All events share one REQUEST_TIMEOUT deadline, keeping the invocation
+    inside Foundry's function timeout; events that cannot be answered by
+    then get an error response instead.
+    
+    Args:
+        events (List[Dict[str, Any]]): Detection/Incident payloads
+        
+    Returns:
+        List[Dict[str, Any]]: One handler response per event, in input order
+    """
+    
+    deadline = time.monotonic() + REQUEST_TIMEOUT
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    limiter = RateLimiter(MAX_REQUESTS_PER_MINUTE) if MAX_REQUESTS_PER_MINUTE > 0 else None
+    
+    async with create_async_client() as client:
+        async def bounded_handler(event: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(
+                        async_handler(event, client, limiter, deadline),
+                        max(deadline - time.monotonic(), 0)
+                    )
+                except asyncio.TimeoutError:
+                    return error_response("Request time budget exhausted before this detection was analyzed")
+        
+        return list(await asyncio.gather(*[bounded_handler(e) for e in events]))
+
+
+def handle_many(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Synchronous entry point for async_handle_many.
+    
+    Args:
+        events (List[Dict[str, Any]]): Detection/Incident payloads
+        
+    Returns:
+        List[Dict[str, Any]]: One handler response per event, in input order
+    """
+    
+    return asyncio.run(async_handle_many(events))
 
 # ============================================================================
 # DATA EXTRACTION FUNCTION
 # ============================================================================
 
+# Output field -> (payload keys in priority order, default when none is set)
+_FIELD_MAP = {
+    'description': (('description', 'summary', 'name', 'behavior'), "No description provided"),
+    'tactic': (('tactic', 'tactics', 'primary_tactic'), "Unknown"),
+    'technique': (('technique', 'techniques', 'primary_technique'), "Unknown"),
+    'host_name': (('hostname', 'host_name', 'device_name', 'computer_name'), "Unknown"),
+    'detection_name': (('name', 'detection_name', 'rule_name'), "Unknown"),
+    'severity': (('severity', 'priority'), "Unknown"),
+    'detection_id': (('detection_id', 'id'), "Unknown")
+}
+
 def extract_detection_data(payload: Dict[str, Any]) -> Optional[Dict[str, str]]:
     """
     Extracts relevant fields from CrowdStrike Detection or Incident JSON payload.
     
-    Looks for:
+    Looks for (key priority is defined by _FIELD_MAP):
     - Description / Summary
     - Tactic (MITRE ATT&CK)
     - Technique (MITRE ATT&CK)
@@ -136,51 +624,16 @@ def extract_detection_data(payload: Dict[str, Any]) -> Optional[Dict[str, str]]:
         Optional[Dict[str, str]]: Extracted fields or None if insufficient data
     """
     
-    extracted = {}
-    
-    # Try to extract description/summary
-    extracted['description'] = payload.get('description') or \
-                               payload.get('summary') or \
-                               payload.get('name') or \
-                               payload.get('behavior') or \
-                               "No description provided"
-    
-    # Try to extract tactic (MITRE ATT&CK)
-    extracted['tactic'] = payload.get('tactic') or \
-                          payload.get('tactics') or \
-                          payload.get('primary_tactic') or \
-                          "Unknown"
-    
-    # Try to extract technique (MITRE ATT&CK)
-    extracted['technique'] = payload.get('technique') or \
-                             payload.get('techniques') or \
-                             payload.get('primary_technique') or \
-                             "Unknown"
-    
-    # Try to extract host/device name
-    extracted['host_name'] = payload.get('hostname') or \
-                             payload.get('host_name') or \
-                             payload.get('device_name') or \
-                             payload.get('computer_name') or \
-                             "Unknown"
-    
-    # Try to extract detection name
-    extracted['detection_name'] = payload.get('name') or \
-                                  payload.get('detection_name') or \
-                                  payload.get('rule_name') or \
-                                  "Unknown"
-    
-    # Try to extract severity
-    extracted['severity'] = str(payload.get('severity') or \
-                                payload.get('priority') or \
-                                "Unknown").upper()
-    
-    # Try to extract detection ID for reference
-    extracted['detection_id'] = payload.get('detection_id') or \
-                                payload.get('id') or \
-                                "Unknown"
-    
-    logger.info("Extracted detection data: %s", json.dumps(extracted, indent=2))
+    payload = strip_routing_keys(payload)
+    
+    extracted = {
+        field: next((value for key in keys if (value := payload.get(key))), default)
+        for field, (keys, default) in _FIELD_MAP.items()
+    }
+    
+    extracted['severity'] = str(extracted['severity']).upper()
+    
+    logger.debug("Extracted detection data: %s", LazyJson(extracted))
     
     return extracted if extracted['description'] != "No description provided" else None
 
@@ -188,130 +641,1509 @@ def extract_detection_data(payload: Dict[str, Any]) -> Optional[Dict[str, str]]:
 # PROMPT BUILDER FUNCTION
 # ============================================================================
 
+_DETECTION_INFO_TMPL = """- Detection Name: {detection_name}
+- Description: {description}
+- MITRE ATT&CK Tactic: {tactic}
+- MITRE ATT&CK Technique: {technique}
+- Affected Host: {host_name}
+- Severity: {severity}
+- Detection ID: {detection_id}"""
+
+_ANALYSIS_STEPS = """1. A brief summary of what this detection indicates
+2. Potential threat actors or campaigns associated with this technique
+3. Recommended immediate investigation steps
+4. Suggested containment/remediation actions
+5. Risk assessment (Critical/High/Medium/Low)"""
+
+_PROMPT_TMPL = f"""You are a senior cybersecurity analyst. Analyze the following CrowdStrike detection and provide a detailed security assessment.
+
+Detection Information:
+{_DETECTION_INFO_TMPL}
+
+Please provide:
+{_ANALYSIS_STEPS}
+
+Format your response in clear sections with proper markdown formatting."""
+
+# Instructions appear once per batch; only the detection blocks repeat
+_BATCH_PROMPT_TMPL = f"""You are a senior cybersecurity analyst. Analyze each of the following {{count}} CrowdStrike detections independently and provide a detailed security assessment for each.
+
+{{sections}}
+
+For each detection, provide:
+{_ANALYSIS_STEPS}
+
+Respond with a JSON object of the form {{{{"analyses": ["...", "..."]}}}} containing exactly {{count}} strings, one markdown-formatted analysis per detection, in the order the detections are listed.{{length_hint}}"""
+
+_BATCH_SECTION_TMPL = "Detection {number}:\n{info}"
+
 def build_analysis_prompt(extracted_data: Dict[str, str]) -> str:
     """
     Builds a structured prompt for Azure OpenAI to analyze the detection.
     
     Args:
-        extracted_data (Dict[str, str]): Extracted detection/incident fields
+        extracted_data (Dict[str, str]): Extracted detection/incident fields, as
+            returned by extract_detection_data (every _FIELD_MAP field is set)
         
     Returns:
         str: Formatted prompt for Azure OpenAI
     """
     
-    prompt = f"""You are a senior cybersecurity analyst. Analyze the following CrowdStrike detection and provide a detailed security assessment.
+    prompt = _PROMPT_TMPL.format_map(format_prompt_fields(extracted_data))
+    
+    logger.debug("Generated prompt: %s", prompt)
+    return prompt
 
-Detection Information:
-- Detection Name: {extracted_data.get('detection_name', 'Unknown')}
-- Description: {extracted_data.get('description', 'Unknown')}
-- MITRE ATT&CK Tactic: {extracted_data.get('tactic', 'Unknown')}
-- MITRE ATT&CK Technique: {extracted_data.get('technique', 'Unknown')}
-- Affected Host: {extracted_data.get('host_name', 'Unknown')}
-- Severity: {extracted_data.get('severity', 'Unknown')}
-- Detection ID: {extracted_data.get('detection_id', 'Unknown')}
 
-Please provide:
-1. A brief summary of what this detection indicates
-2. Potential threat actors or campaigns associated with this technique
-3. Recommended immediate investigation steps
-4. Suggested containment/remediation actions
-5. Risk assessment (Critical/High/Medium/Low)
+def build_detection_info(extracted_data: Dict[str, str]) -> str:
+    """
+    Renders the detection information block used in batched prompts.
+    
+    Args:
+        extracted_data (Dict[str, str]): Extracted detection/incident fields
+        
+    Returns:
+        str: Bulleted detection fields without analysis instructions
+    """
+    
+    return _DETECTION_INFO_TMPL.format_map(format_prompt_fields(extracted_data))
 
-Format your response in clear sections with proper markdown formatting."""
+
+def format_prompt_fields(extracted_data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Renders every extracted field with format_prompt_value.
     
-    logger.debug("Generated prompt: %s", prompt)
-    return prompt
+    Args:
+        extracted_data (Dict[str, Any]): Extracted detection/incident fields
+        
+    Returns:
+        Dict[str, str]: Prompt text keyed by field name
+    """
+    
+    return {field: format_prompt_value(value) for field, value in extracted_data.items()}
 
-# ============================================================================
-# AZURE OPENAI API CALL FUNCTION
-# ============================================================================
 
-def call_azure_openai(prompt: str) -> Optional[str]:
+def format_prompt_value(value: Any) -> str:
     """
-    Sends the analysis prompt to Azure OpenAI and retrieves the response.
+    Renders an extracted field compactly for the prompt.
     
-    Uses the Azure OpenAI Chat Completions API.
+    Payload fields such as ``tactics`` or ``techniques`` can be lists or
+    objects. Their Python repr spends input tokens on quotes, brackets and
+    padding, so lists are joined with commas and objects become compact JSON.
     
     Args:
-        prompt (str): The analysis prompt to send to Azure OpenAI
+        value (Any): Extracted field value
         
     Returns:
-        Optional[str]: The AI-generated analysis response or None on error
+        str: Prompt text for the value
     """
     
-    try:
-        # Construct the Azure OpenAI API endpoint
-        api_url = f"{AZURE_ENDPOINT_URL}/openai/deployments/{AZURE_DEPLOYMENT_NAME}/chat/completions?api-version={API_VERSION}"
+    if isinstance(value, str):
+        return value
+    
+    if isinstance(value, (list, tuple)):
+        return ", ".join(format_prompt_value(item) for item in value)
+    
+    if isinstance(value, dict):
+        return orjson.dumps(value, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    return str(value)
+
+
+def build_batch_prompt(detections: List[str], max_words: Optional[int] = None) -> str:
+    """
+    Packs several detections into one prompt that asks for a JSON array of analyses.
+    
+    Args:
+        detections (List[str]): Detection blocks produced by build_detection_info
+        max_words (Optional[int]): Length limit per analysis, when the
+            completion budget is tighter than usual
         
-        # Prepare request headers
-        headers = {
-            "Content-Type": "application/json",
-            "api-key": AZURE_API_KEY
-        }
+    Returns:
+        str: Combined prompt asking for one analysis per detection
+    """
+    
+    return _BATCH_PROMPT_TMPL.format(
+        count=len(detections),
+        length_hint=f" Keep each analysis under {max_words} words." if max_words else "",
+        sections="\n\n".join(
+            _BATCH_SECTION_TMPL.format(number=number, info=info)
+            for number, info in enumerate(detections, 1)
+        )
+    )
+
+
+def parse_batch_response(response: Optional[str], count: int) -> List[Optional[str]]:
+    """
+    Parses a batched JSON response into per-detection analyses.
+    
+    Args:
+        response (Optional[str]): Response text for a build_batch_prompt prompt
+        count (int): Number of detections in the batch
+        
+    Returns:
+        List[Optional[str]]: ``count`` analyses, all None if they cannot be matched up
+    """
+    
+    if not response:
+        return [None] * count
+    
+    try:
+        analyses = orjson.loads(response).get("analyses")
+    except (orjson.JSONDecodeError, AttributeError):
+        logger.error("Batched response is not a JSON object")
+        return [None] * count
+    
+    # A miscount means analyses can no longer be matched to detections reliably
+    if not isinstance(analyses, list) or len(analyses) != count:
+        logger.error("Batched response does not hold %d analyses", count)
+        return [None] * count
+    
+    return [(analysis.strip() or None) if isinstance(analysis, str) else None for analysis in analyses]
+
+# ============================================================================
+# TOKEN BUDGET FUNCTIONS
+# ============================================================================
+
+# Lazily loaded tiktoken encoding; False once loading it has failed
+_token_encoding: Any = None
+
+# Token count of the static system message, computed on first use
+_system_prompt_tokens: Optional[int] = None
+
+
+class PromptTooLargeError(ValueError):
+    """
+    Raised when a prompt leaves too little of the context window for a completion.
+    
+    Azure would reject the request, so it is never sent; handlers report the
+    message to the caller.
+    """
+
+
+def count_tokens(text: str) -> int:
+    """
+    Counts (or, without tiktoken, conservatively estimates) tokens in text.
+    
+    Args:
+        text (str): Text to measure
+        
+    Returns:
+        int: Token count
+    """
+    
+    global _token_encoding
+    
+    if _token_encoding is None:
+        _token_encoding = False
+        
+        if tiktoken is not None:
+            try:
+                _token_encoding = tiktoken.get_encoding(TOKEN_ENCODING)
+            except Exception as e:
+                logger.warning("tiktoken encoding unavailable, estimating token counts: %s", str(e))
+    
+    if _token_encoding:
+        return len(_token_encoding.encode(text, disallowed_special=()))
+    
+    # Roughly 4 characters per token for English; 3 errs on the side of more tokens
+    return len(text) // 3 + 1
+
+
+def fit_max_tokens(prompt: str, max_tokens: int) -> int:
+    """
+    Clamps the completion budget so prompt + completion fit the context window.
+    
+    Args:
+        prompt (str): The user prompt (the system prompt is added automatically)
+        max_tokens (int): Requested completion token limit
+        
+    Returns:
+        int: The completion token limit to send
+        
+    Raises:
+        PromptTooLargeError: If the prompt leaves less than MIN_COMPLETION_TOKENS
+            of the context window, so Azure would reject the request
+    """
+    
+    global _system_prompt_tokens
+    
+    if _system_prompt_tokens is None:
+        _system_prompt_tokens = count_tokens(SYSTEM_PROMPT)
+    
+    prompt_tokens = _system_prompt_tokens + count_tokens(prompt)
+    available = MODEL_CONTEXT_TOKENS - prompt_tokens - CONTEXT_SAFETY_MARGIN
+    
+    if available < MIN_COMPLETION_TOKENS:
+        logger.error("Prompt is ~%d tokens, too large for the %d-token context window",
+                    prompt_tokens, MODEL_CONTEXT_TOKENS)
+        raise PromptTooLargeError(
+            f"Detection data is too large to analyze: the prompt is ~{prompt_tokens} tokens "
+            f"and the model context is {MODEL_CONTEXT_TOKENS} tokens"
+        )
+    
+    fitted = min(max_tokens, available)
+    
+    if fitted != max_tokens:
+        logger.info("Clamped max_tokens from %d to %d (prompt is ~%d tokens)",
+                    max_tokens, fitted, prompt_tokens)
+    
+    return fitted
+
+
+def time_budget_tokens(deadline: float) -> int:
+    """
+    Estimates how many completion tokens can stream back before the deadline.
+    
+    Args:
+        deadline (float): time.monotonic() by which the response must end
+        
+    Returns:
+        int: Completion token budget at COMPLETION_TOKENS_PER_SECOND
+    """
+    
+    return int(max(deadline - time.monotonic(), 0) * COMPLETION_TOKENS_PER_SECOND)
+
+
+def pack_batches(items: List[tuple]) -> Iterator[List[tuple]]:
+    """
+    Groups batch items so each request stays within its share of the context.
+    
+    A group is closed once it holds MAX_BATCH_SIZE items or the next item
+    would push its detection blocks plus completion budgets past
+    BATCH_CONTEXT_FRACTION of the context window. The remaining share covers
+    the system prompt and the batch instructions. An item that alone exceeds
+    the budget still gets a group of its own.
+    
+    Args:
+        items (List[tuple]): ``(index, extracted_data, detection_info, max_tokens)`` tuples
+        
+    Yields:
+        List[tuple]: Consecutive groups of items, in input order
+    """
+    
+    budget = int(MODEL_CONTEXT_TOKENS * BATCH_CONTEXT_FRACTION)
+    group: List[tuple] = []
+    used = 0
+    
+    for item in items:
+        cost = count_tokens(item[2]) + item[3]
+        
+        if group and (len(group) >= MAX_BATCH_SIZE or used + cost > budget):
+            yield group
+            group, used = [], 0
+        
+        group.append(item)
+        used += cost
+    
+    if group:
+        yield group
+
+# ============================================================================
+# AZURE OPENAI API CALL FUNCTION
+# ============================================================================
+
+class CompletionTruncatedError(Exception):
+    """
+    Raised when a structured (JSON) completion is cut off at max_tokens.
+    """
+
+
+def build_chat_payload(prompt: str, max_tokens: Optional[int] = None,
+                       response_format: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Builds the Chat Completions request body for an analysis prompt.
+    
+    Args:
+        prompt (str): The analysis prompt to send to Azure OpenAI
+        max_tokens (Optional[int]): Override for the completion token limit
+            (clamped to the remaining context window)
+        response_format (Optional[Dict[str, str]]): Structured output mode,
+            e.g. JSON_RESPONSE_FORMAT
+        
+    Returns:
+        Dict[str, Any]: Request body (without the deployment/model name)
+    """
+    
+    payload = {
+        "messages": [
+            _SYSTEM_MSG,
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        **COMPLETION_PARAMS
+    }
+    
+    payload["max_tokens"] = fit_max_tokens(prompt, max_tokens or COMPLETION_PARAMS["max_tokens"])
+    
+    if response_format:
+        payload["response_format"] = response_format
+    
+    return payload
+
+
+def call_azure_openai(prompt: str, max_tokens: Optional[int] = None,
+                      response_format: Optional[Dict[str, str]] = None,
+                      deadline: Optional[float] = None) -> Optional[str]:
+    """
+    Sends the analysis prompt to Azure OpenAI and retrieves the response.
+    
+    Accumulates the streamed response from stream_azure_openai into the full
+    analysis text.
+    
+    Args:
+        prompt (str): The analysis prompt to send to Azure OpenAI
+        max_tokens (Optional[int]): Override for the completion token limit
+        response_format (Optional[Dict[str, str]]): Structured output mode
+        deadline (Optional[float]): time.monotonic() by which the call must end
+            (defaults to REQUEST_TIMEOUT from now)
+        
+    Returns:
+        Optional[str]: The AI-generated analysis response or None on error
+        
+    Raises:
+        PromptTooLargeError: If the prompt does not fit the context window
+    """
+    
+    try:
+        analysis = "".join(stream_azure_openai(prompt, max_tokens, response_format, deadline))
+        
+        if analysis:
+            logger.info("Successfully extracted analysis from Azure OpenAI")
+            return analysis
+        
+        logger.error("Azure OpenAI stream ended without any content")
+        return None
+        
+    except httpx.HTTPStatusError as e:
+        logger.error("Azure OpenAI API error: Status %s, Response: %s",
+                    e.response.status_code, e.response.text)
+        return None
+    except httpx.HTTPError as e:
+        logger.error("Request exception when calling Azure OpenAI: %s", str(e))
+        return None
+    except orjson.JSONDecodeError as e:
+        logger.error("JSON decode error: %s", str(e))
+        return None
+    except CompletionTruncatedError as e:
+        logger.error("%s", str(e))
+        return None
+    except PromptTooLargeError:
+        # Nothing was sent; the caller reports the reason
+        raise
+    except Exception as e:
+        logger.error("Unexpected error in call_azure_openai: %s", str(e), exc_info=True)
+        return None
+
+
+def stream_azure_openai(prompt: str, max_tokens: Optional[int] = None,
+                        response_format: Optional[Dict[str, str]] = None,
+                        deadline: Optional[float] = None) -> Iterator[str]:
+    """
+    Streams the analysis from the Azure OpenAI Chat Completions API.
+    
+    Yields content deltas as Azure generates them, so consumers can start
+    rendering within the time to first token. The connection is released
+    when the stream ends or the generator is closed.
+    
+    httpx applies its timeout to each read, so a slow but steady stream would
+    never time out; the deadline is checked between lines as well.
+    
+    Args:
+        prompt (str): The analysis prompt to send to Azure OpenAI
+        max_tokens (Optional[int]): Override for the completion token limit
+        response_format (Optional[Dict[str, str]]): Structured output mode
+        deadline (Optional[float]): time.monotonic() by which the stream must end
+            (defaults to REQUEST_TIMEOUT from now)
+        
+    Yields:
+        str: Successive pieces of the assistant message
+        
+    Raises:
+        httpx.HTTPStatusError: If Azure OpenAI responds with a non-200 status
+        httpx.TimeoutException: If the stream runs past the deadline
+        httpx.HTTPError: If the request fails
+        CompletionTruncatedError: If a structured (response_format) answer
+            hit the max_tokens limit, leaving it unparseable
+    """
+    
+    if deadline is None:
+        deadline = time.monotonic() + REQUEST_TIMEOUT
+    
+    # Prepare request payload
+    payload = build_chat_payload(prompt, max_tokens, response_format)
+    payload["stream"] = True
+    
+    logger.info("Sending request to Azure OpenAI: %s", _API_URL)
+    
+    # Send POST request to Azure OpenAI
+    response = post_with_retry(payload, deadline)
+    
+    logger.info("Azure OpenAI response status: %s", response.status_code)
+    
+    finish_reason = None
+    
+    try:
+        # Check for successful response
+        if response.status_code != 200:
+            response.read()
+            response.raise_for_status()
+        
+        for line in response.iter_lines():
+            if time.monotonic() > deadline:
+                raise httpx.TimeoutException("Azure OpenAI stream exceeded the request time budget")
+            
+            if not line.startswith("data:"):
+                continue
+            
+            data = line[5:].strip()
+            
+            if data == "[DONE]":
+                break
+            
+            # The first chunk may only carry content filter results
+            choices = orjson.loads(data).get("choices")
+            
+            if choices:
+                finish_reason = choices[0].get("finish_reason") or finish_reason
+                content = (choices[0].get("delta") or {}).get("content")
+                
+                if content:
+                    yield content
+        
+        if finish_reason == "length":
+            logger.warning("Azure OpenAI completion stopped at the max_tokens limit")
+            
+            if response_format:
+                raise CompletionTruncatedError("Structured completion was cut off at the max_tokens limit")
+    finally:
+        response.close()
+
+
+def post_with_retry(payload: Dict[str, Any], deadline: Optional[float] = None) -> httpx.Response:
+    """
+    POSTs to Azure OpenAI, retrying rate limits and transient failures.
+    
+    Retries 429/5xx responses and connection errors/timeouts up to
+    MAX_ATTEMPTS times. The wait honours Retry-After (plus jitter) when Azure
+    sends it and otherwise uses exponential backoff with jitter. All attempts and waits
+    share a single REQUEST_TIMEOUT budget.
+    
+    Args:
+        payload (Dict[str, Any]): Chat Completions request body
+        deadline (Optional[float]): time.monotonic() by which the request must
+            end (defaults to REQUEST_TIMEOUT from now)
+        
+    Returns:
+        httpx.Response: The last response received (streamed if requested)
+        
+    Raises:
+        httpx.TransportError: If the last attempt failed to connect
+    """
+    
+    if deadline is None:
+        deadline = time.monotonic() + REQUEST_TIMEOUT
+    
+    for attempt in range(MAX_ATTEMPTS):
+        response = None
+        
+        if time.monotonic() >= deadline:
+            break
+        
+        try:
+            request = _CLIENT.build_request(
+                "POST",
+                _API_URL,
+                headers=_HEADERS,
+                content=orjson.dumps(payload),
+                timeout=max(deadline - time.monotonic(), 1)
+            )
+            response = _CLIENT.send(request, stream=payload.get("stream", False))
+            
+            if response.status_code not in RETRYABLE_STATUS_CODES:
+                return response
+            
+            delay = retry_after_seconds(response)
+            
+        except httpx.TransportError as e:
+            logger.warning("Azure OpenAI request attempt %d failed: %s", attempt + 1, str(e))
+            delay = None
+            
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+        
+        delay = backoff_delay(attempt, delay)
+        
+        if attempt == MAX_ATTEMPTS - 1 or time.monotonic() + delay >= deadline:
+            break
+        
+        logger.warning("Retrying Azure OpenAI request in %.1fs (attempt %d of %d)",
+                       delay, attempt + 2, MAX_ATTEMPTS)
+        
+        # Release the pooled connection held by the discarded (streamed) response
+        if response is not None:
+            response.close()
+        
+        time.sleep(delay)
+    
+    if response is None:
+        raise httpx.TimeoutException("Azure OpenAI request time budget exhausted")
+    
+    return response
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """
+    Reads the server-requested retry delay from an Azure OpenAI response.
+    
+    Args:
+        response (httpx.Response): Throttled or failed response
+        
+    Returns:
+        Optional[float]: Delay in seconds, or None if the server gave none
+    """
+    
+    try:
+        if "retry-after-ms" in response.headers:
+            return float(response.headers["retry-after-ms"]) / 1000
+        if "Retry-After" in response.headers:
+            return float(response.headers["Retry-After"])
+    except ValueError:
+        pass
+    
+    return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """
+    Computes the wait before the next attempt.
+    
+    Args:
+        attempt (int): Zero-based number of the attempt that failed
+        retry_after (Optional[float]): Server-requested delay, if any
+        
+    Returns:
+        float: Seconds to wait (with jitter)
+    """
+    
+    if retry_after is None:
+        return min(2 ** attempt + random.random(), 20)
+    
+    # Spread out clients that were all told to come back at the same time
+    return retry_after + random.uniform(0, 1)
+
+
+def call_sdk_with_retry(call: Callable[[float], Any], deadline: Optional[float] = None) -> Any:
+    """
+    Runs an SDK call with the REST path's retry policy and time budget.
+    
+    The SDK clients do not retry on their own (max_retries=0); here every
+    attempt gets the time left before the deadline as its timeout, so all
+    attempts and waits share one REQUEST_TIMEOUT budget.
+    
+    Args:
+        call (Callable[[float], Any]): Makes the request given its timeout in seconds
+        deadline (Optional[float]): time.monotonic() by which the call must end
+            (defaults to REQUEST_TIMEOUT from now)
+        
+    Returns:
+        Any: The call's result
+        
+    Raises:
+        openai.APIError: If the last attempt failed or no time is left to retry
+    """
+    
+    if deadline is None:
+        deadline = time.monotonic() + REQUEST_TIMEOUT
+    
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return call(max(deadline - time.monotonic(), 1))
+        except APIError as e:
+            delay = sdk_retry_delay(e, attempt, deadline)
+            
+            if delay is None:
+                raise
+            
+            time.sleep(delay)
+
+
+async def async_call_sdk_with_retry(call: Callable[[float], Awaitable[Any]],
+                                    deadline: Optional[float] = None) -> Any:
+    """
+    Async variant of call_sdk_with_retry.
+    
+    Args:
+        call (Callable[[float], Awaitable[Any]]): Makes the request given its timeout in seconds
+        deadline (Optional[float]): time.monotonic() by which the call must end
+            (defaults to REQUEST_TIMEOUT from now)
+        
+    Returns:
+        Any: The call's result
+        
+    Raises:
+        openai.APIError: If the last attempt failed or no time is left to retry
+    """
+    
+    if deadline is None:
+        deadline = time.monotonic() + REQUEST_TIMEOUT
+    
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return await call(max(deadline - time.monotonic(), 1))
+        except APIError as e:
+            delay = sdk_retry_delay(e, attempt, deadline)
+            
+            if delay is None:
+                raise
+            
+            await asyncio.sleep(delay)
+
+
+def sdk_retry_delay(error: APIError, attempt: int, deadline: float) -> Optional[float]:
+    """
+    Decides whether a failed SDK attempt is retried and after what wait.
+    
+    Args:
+        error (APIError): Error raised by the attempt
+        attempt (int): Zero-based number of the attempt that failed
+        deadline (float): time.monotonic() by which the call must end
+        
+    Returns:
+        Optional[float]: Seconds to wait, or None to give up and re-raise
+    """
+    
+    if isinstance(error, APIConnectionError):
+        retry_after = None
+    elif isinstance(error, APIStatusError) and error.status_code in RETRYABLE_STATUS_CODES:
+        retry_after = retry_after_seconds(error.response)
+    else:
+        return None
+    
+    delay = backoff_delay(attempt, retry_after)
+    
+    if attempt == MAX_ATTEMPTS - 1 or time.monotonic() + delay >= deadline:
+        return None
+    
+    logger.warning("Retrying Azure OpenAI SDK call in %.1fs after: %s (attempt %d of %d)",
+                   delay, str(error), attempt + 2, MAX_ATTEMPTS)
+    return delay
+
+# ============================================================================
+# AZURE OPENAI BATCH API FUNCTIONS
+# ============================================================================
+
+_SDK_CLIENT: Optional[AzureOpenAI] = None
+
+
+def get_client() -> AzureOpenAI:
+    """
+    Returns the process-wide synchronous Azure OpenAI SDK client.
+    
+    The client is created on first use and shares the module's HTTP/2
+    connection pool, so SDK calls reuse connections already opened by the
+    REST path instead of paying their own TCP/TLS handshake. It does not
+    retry by itself; wrap calls in call_sdk_with_retry.
+    
+    Returns:
+        AzureOpenAI: Configured client
+    """
+    
+    global _SDK_CLIENT
+    
+    if _SDK_CLIENT is None:
+        _SDK_CLIENT = AzureOpenAI(
+            api_key=AZURE_API_KEY,
+            azure_endpoint=AZURE_ENDPOINT_URL,
+            api_version=API_VERSION,
+            timeout=REQUEST_TIMEOUT,
+            max_retries=0,
+            http_client=_CLIENT
+        )
+    
+    return _SDK_CLIENT
+
+
+def submit_batch(events: List[Dict[str, Any]]) -> Optional[str]:
+    """
+    Submits detections to the Azure OpenAI Batch API.
+    
+    Each detection becomes one JSONL request line whose body matches the
+    real-time request. The ``custom_id`` is ``"<index>:<detection_id>"`` so
+    results can be matched back to the submitted events.
+    
+    Args:
+        events (List[Dict[str, Any]]): Detection/Incident payloads
+        
+    Returns:
+        Optional[str]: Batch job ID, or None if no event had usable data
+    """
+    
+    lines = []
+    
+    for index, event in enumerate(events):
+        extracted_data = extract_detection_data(event if isinstance(event, dict) else {})
+        
+        if not extracted_data:
+            logger.warning("Skipping batch event %d: no detection/incident data", index)
+            continue
+        
+        try:
+            body = build_chat_payload(build_analysis_prompt(extracted_data), get_max_tokens_override(event))
+        except ValueError as e:
+            logger.warning("Skipping batch event %d: %s", index, str(e))
+            continue
+        
+        lines.append(orjson.dumps({
+            "custom_id": f"{index}:{extracted_data['detection_id']}",
+            "method": "POST",
+            "url": "/chat/completions",
+            "body": {
+                "model": AZURE_BATCH_DEPLOYMENT_NAME,
+                **body
+            }
+        }))
+    
+    if not lines:
+        return None
+    
+    client = get_client()
+    deadline = time.monotonic() + REQUEST_TIMEOUT
+    content = b"\n".join(lines)
+    
+    batch_file = call_sdk_with_retry(
+        lambda timeout: client.files.create(
+            file=("batch.jsonl", io.BytesIO(content)),
+            purpose="batch",
+            timeout=timeout
+        ),
+        deadline
+    )
+    
+    batch = call_sdk_with_retry(
+        lambda timeout: client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/chat/completions",
+            completion_window="24h",
+            timeout=timeout
+        ),
+        deadline
+    )
+    
+    logger.info("Submitted batch %s with %d requests", batch.id, len(lines))
+    return batch.id
+
+
+def poll_batch(batch_id: str) -> Dict[str, Any]:
+    """
+    Checks an Azure OpenAI Batch API job and collects its results.
+    
+    Args:
+        batch_id (str): Batch job ID returned by submit_batch
+        
+    Returns:
+        Dict[str, Any]: Batch status and, once the job has ended, a ``results``
+            map of custom_id to analysis (None for requests that failed).
+            Azure writes failed requests to the batch's error file, so both
+            the output and the error file are read. Failed, expired and
+            cancelled jobs return an error status; expired and cancelled jobs
+            still carry the results of the requests that finished in time.
+    """
+    
+    client = get_client()
+    deadline = time.monotonic() + REQUEST_TIMEOUT
+    batch = call_sdk_with_retry(lambda timeout: client.batches.retrieve(batch_id, timeout=timeout), deadline)
+    
+    logger.info("Batch %s status: %s", batch_id, batch.status)
+    
+    response = {
+        "status": "success",
+        "message": f"Batch {batch.status}",
+        "analysis": "",
+        "batch_id": batch_id,
+        "batch_status": batch.status,
+        "results": {}
+    }
+    
+    if batch.status not in ("completed", "failed", "expired", "cancelled"):
+        return response
+    
+    if batch.status != "completed":
+        errors = [error.message for error in ((batch.errors and batch.errors.data) or []) if error.message]
+        response["status"] = "error"
+        response["message"] = f"Batch {batch.status}" + (f": {'; '.join(errors)}" if errors else "")
+        logger.error("Batch %s ended as %s: %s", batch_id, batch.status, errors)
+    
+    for result in read_batch_file(client, batch.output_file_id, deadline):
+        body = (result.get("response") or {}).get("body") or {}
+        choices = body.get("choices") or []
+        
+        if choices:
+            response["results"][result["custom_id"]] = choices[0]["message"]["content"]
+        else:
+            logger.error("Batch request %s failed: %s", result.get("custom_id"), result.get("error"))
+            response["results"][result["custom_id"]] = None
+    
+    for result in read_batch_file(client, batch.error_file_id, deadline):
+        error = result.get("error") or ((result.get("response") or {}).get("body") or {}).get("error")
+        logger.error("Batch request %s failed: %s", result.get("custom_id"), error)
+        response["results"][result["custom_id"]] = None
+    
+    return response
+
+
+def read_batch_file(client: AzureOpenAI, file_id: Optional[str],
+                    deadline: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Reads the JSONL records of a Batch API output or error file.
+    
+    Args:
+        client (AzureOpenAI): SDK client used to download the file
+        file_id (Optional[str]): File ID (None when the batch has no such file)
+        deadline (Optional[float]): time.monotonic() by which the download must end
+        
+    Yields:
+        Dict[str, Any]: One record per batch request
+    """
+    
+    if not file_id:
+        return
+    
+    content = call_sdk_with_retry(lambda timeout: client.files.content(file_id, timeout=timeout), deadline)
+    
+    for line in content.text.splitlines():
+        if line.strip():
+            yield orjson.loads(line)
+
+# ============================================================================
+# ANALYSIS CACHE FUNCTIONS
+# ============================================================================
+
+_ANALYSIS_CACHE: "OrderedDict[str, str]" = OrderedDict()
+
+# Everything besides the prompt that determines the analysis; part of every cache key
+_CACHE_KEY_PREFIX = orjson.dumps([AZURE_DEPLOYMENT_NAME, API_VERSION, SYSTEM_PROMPT, COMPLETION_PARAMS])
+
+# Lazily opened SQLite connection; False once opening it has failed
+_disk_cache: Any = None
+
+# Serializes cache access; the async path reads and writes from worker threads
+_CACHE_LOCK = threading.RLock()
+
+
+def analysis_cache_key(prompt: str, max_tokens: Optional[int] = None) -> str:
+    """
+    Computes the cache key for an analysis request.
+    
+    The key covers the deployment, API version, system prompt and sampling
+    parameters as well as the prompt, so a configuration change never serves
+    analyses produced under the old settings.
+    
+    Args:
+        prompt (str): The analysis prompt
+        max_tokens (Optional[int]): Completion token limit override
         
-        # Prepare request payload
-        payload = {
-            "messages": [
-                {
-                    "role": "system",
-                    "content": "You are a cybersecurity expert specializing in threat analysis and incident response."
-                },
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "temperature": 0.7,
-            "max_tokens": 2000,
-            "top_p": 0.95,
-            "frequency_penalty": 0,
-            "presence_penalty": 0
-        }
+    Returns:
+        str: Hex digest identifying the request
+    """
+    
+    # An explicit default max_tokens requests the same completion as no override
+    max_tokens = max_tokens or COMPLETION_PARAMS["max_tokens"]
+    
+    digest = hashlib.blake2b(_CACHE_KEY_PREFIX, digest_size=16)
+    digest.update(f"\0{max_tokens}\0{prompt}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_disk_cache() -> Optional[sqlite3.Connection]:
+    """
+    Opens the persistent analysis cache, purging expired entries.
+    
+    Returns:
+        Optional[sqlite3.Connection]: Cache connection, or None if disabled or unavailable
+    """
+    
+    global _disk_cache
+    
+    if _disk_cache is None:
+        _disk_cache = False
         
-        logger.info("Sending request to Azure OpenAI: %s", api_url)
+        if ANALYSIS_CACHE_PATH and prepare_private_file(ANALYSIS_CACHE_PATH):
+            try:
+                connection = sqlite3.connect(ANALYSIS_CACHE_PATH, timeout=1, check_same_thread=False)
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS analyses "
+                    "(key TEXT PRIMARY KEY, analysis TEXT NOT NULL, expires REAL NOT NULL)"
+                )
+                connection.execute("DELETE FROM analyses WHERE expires <= ?", (time.time(),))
+                connection.commit()
+                _disk_cache = connection
+            except sqlite3.Error as e:
+                logger.warning("Persistent analysis cache unavailable at %s: %s", ANALYSIS_CACHE_PATH, str(e))
+    
+    return _disk_cache or None
+
+
+def prepare_private_file(path: str) -> bool:
+    """
+    Creates the cache file readable and writable by the current user only.
+    
+    The directory is created with mode 0700 and the file with mode 0600
+    without following symlinks. An existing file that another user owns, or
+    that group/other can access, is refused so nobody else can read the
+    cached detection data or plant an analysis in it.
+    
+    Args:
+        path (str): Cache file path
         
-        # Send POST request to Azure OpenAI
-        response = requests.post(
-            api_url,
-            headers=headers,
-            json=payload,
-            timeout=25  # Must be less than Foundry's 30-second timeout
-        )
+    Returns:
+        bool: True if the file is private to the current user
+    """
+    
+    try:
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
         
-        logger.info("Azure OpenAI response status: %s", response.status_code)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+        try:
+            stat = os.fstat(fd)
+        finally:
+            os.close(fd)
+    except OSError as e:
+        logger.warning("Persistent analysis cache unavailable at %s: %s", path, str(e))
+        return False
+    
+    if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+        logger.warning("Persistent analysis cache disabled: %s is not private to this user", path)
+        return False
+    
+    return True
+
+
+def get_cached_analysis(key: str) -> Optional[str]:
+    """
+    Looks up a cached analysis, first in memory and then on disk.
+    
+    Args:
+        key (str): Key from analysis_cache_key
         
-        # Check for successful response
-        if response.status_code != 200:
-            logger.error("Azure OpenAI API error: Status %s, Response: %s",
-                        response.status_code, response.text)
+    Returns:
+        Optional[str]: The cached analysis, or None on a miss
+    """
+    
+    with _CACHE_LOCK:
+        analysis = _ANALYSIS_CACHE.get(key)
+        
+        if analysis is not None:
+            _ANALYSIS_CACHE.move_to_end(key)
+            logger.info("Analysis cache hit: %s", key)
+            return analysis
+        
+        disk_cache = get_disk_cache()
+        
+        if disk_cache is None:
             return None
         
-        # Parse response JSON
-        response_json = response.json()
+        try:
+            row = disk_cache.execute(
+                "SELECT analysis FROM analyses WHERE key = ? AND expires > ?", (key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Persistent analysis cache read failed: %s", str(e))
+            return None
         
-        # Extract the assistant's message
-        if 'choices' in response_json and len(response_json['choices']) > 0:
-            analysis = response_json['choices'][0]['message']['content']
-            logger.info("Successfully extracted analysis from Azure OpenAI")
-            return analysis
-        else:
-            logger.error("Unexpected response format from Azure OpenAI: %s", response_json)
+        if row is None:
             return None
+        
+        logger.info("Persistent analysis cache hit: %s", key)
+        remember_analysis(key, row[0])
+        return row[0]
+
+
+def remember_analysis(key: str, analysis: str) -> None:
+    """
+    Stores an analysis in memory, evicting the least recently used entry when full.
+    
+    Args:
+        key (str): Key from analysis_cache_key
+        analysis (str): The analysis to cache
+    """
+    
+    with _CACHE_LOCK:
+        _ANALYSIS_CACHE[key] = analysis
+        _ANALYSIS_CACHE.move_to_end(key)
+        
+        if len(_ANALYSIS_CACHE) > ANALYSIS_CACHE_SIZE:
+            _ANALYSIS_CACHE.popitem(last=False)
+
+
+def cache_analysis(key: str, analysis: Optional[str]) -> None:
+    """
+    Stores an analysis in memory and in the persistent cache.
+    
+    Failed calls (no analysis) are not cached so they are retried next time.
+    
+    Args:
+        key (str): Key from analysis_cache_key
+        analysis (Optional[str]): The analysis to cache
+    """
+    
+    if not analysis:
+        return
+    
+    with _CACHE_LOCK:
+        remember_analysis(key, analysis)
+        
+        disk_cache = get_disk_cache()
+        
+        if disk_cache is None:
+            return
+        
+        try:
+            disk_cache.execute(
+                "INSERT OR REPLACE INTO analyses (key, analysis, expires) VALUES (?, ?, ?)",
+                (key, analysis, time.time() + ANALYSIS_CACHE_TTL)
+            )
+            disk_cache.commit()
+        except sqlite3.Error as e:
+            logger.warning("Persistent analysis cache write failed: %s", str(e))
+
+
+def cached_call_azure_openai(prompt: str, max_tokens: Optional[int] = None,
+                             deadline: Optional[float] = None) -> Optional[str]:
+    """
+    call_azure_openai with an in-memory LRU and persistent cache keyed by the prompt.
+    
+    Repeats of the same detection (the UI re-fetching an incident, a retried
+    or replayed event, or a duplicate delivery) build identical prompts and
+    are answered from the cache without a round trip to Azure. The prompt
+    includes the host and detection ID, so the same rule firing on different
+    hosts is analyzed separately.
+    
+    Args:
+        prompt (str): The analysis prompt to send to Azure OpenAI
+        max_tokens (Optional[int]): Override for the completion token limit
+        deadline (Optional[float]): time.monotonic() by which the call must end
+            (defaults to REQUEST_TIMEOUT from now)
+        
+    Returns:
+        Optional[str]: The AI-generated analysis response or None on error
+        
+    Raises:
+        PromptTooLargeError: If the prompt does not fit the context window
+    """
+    
+    key = analysis_cache_key(prompt, max_tokens)
+    analysis = get_cached_analysis(key)
+    
+    if analysis is None:
+        analysis = call_azure_openai(prompt, max_tokens, deadline=deadline)
+        cache_analysis(key, analysis)
+    
+    return analysis
+
+# ============================================================================
+# RATE LIMITER (Request pacing for the async path)
+# ============================================================================
+
+# Seconds to hold requests after Azure reports an exhausted quota without a
+# reset header (Azure evaluates RPM/TPM over windows of a few seconds)
+RATE_LIMIT_RESET_FALLBACK = 10.0
+
+# Duration format of x-ratelimit-reset-* headers, e.g. "1m30s" or "250ms"
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class RateLimitTimeoutError(TimeoutError):
+    """
+    Raised when the rate limiter would hold a request past its deadline.
+    """
+
+
+class RateLimiter:
+    """
+    Token bucket that paces request starts to a requests-per-minute budget.
+    
+    The bucket holds at most one second's worth of requests, so a burst cannot
+    spend a whole minute's quota at once. update() feeds back the quota Azure
+    reports in its x-ratelimit-* headers: the bucket is capped at the
+    remaining requests, and once requests or tokens run out, acquire() holds
+    new requests until the reported window reset.
+    
+    Create it inside the running event loop (its lock is bound to that loop).
+    """
+    
+    def __init__(self, max_rate: float, time_period: float = 60.0):
+        if max_rate <= 0:
+            raise ValueError("max_rate must be positive")
+        
+        self.rate = max_rate / time_period
+        self.capacity = max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        
+        # No request starts before this time (requests quota exhausted)
+        self._resume_at = 0.0
+        
+        # Azure's remaining TPM quota and when it resets, once reported
+        self._tokens_left: Optional[int] = None
+        self._tokens_reset_at = 0.0
+    
+    async def acquire(self, token_budget: int = 0, deadline: Optional[float] = None) -> None:
+        """
+        Waits until a request may start and consumes one token.
+        
+        Args:
+            token_budget (int): Prompt plus completion tokens the request may
+                use, checked against the remaining TPM quota
+            deadline (Optional[float]): time.monotonic() the request must start by
             
-    except requests.exceptions.RequestException as e:
-        logger.error("Request exception when calling Azure OpenAI: %s", str(e))
+        Raises:
+            RateLimitTimeoutError: If the wait would run past the deadline (raised
+                right away rather than after sleeping)
+        """
+        
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                
+                if now < self._resume_at:
+                    await self._wait_until(self._resume_at, deadline)
+                    continue
+                
+                if self._tokens_left is not None and token_budget > self._tokens_left:
+                    if now < self._tokens_reset_at:
+                        await self._wait_until(self._tokens_reset_at, deadline)
+                        continue
+                    
+                    self._tokens_left = None
+                
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    
+                    if self._tokens_left is not None:
+                        self._tokens_left -= token_budget
+                    
+                    return
+                
+                await self._wait_until(now + (1 - self._tokens) / self.rate, deadline)
+    
+    @staticmethod
+    async def _wait_until(wake_at: float, deadline: Optional[float]) -> None:
+        """
+        Sleeps until wake_at, failing fast if that is past the deadline.
+        """
+        
+        if deadline is not None and wake_at > deadline:
+            raise RateLimitTimeoutError("Azure OpenAI rate limit leaves no room for this request before the deadline")
+        
+        await asyncio.sleep(max(wake_at - time.monotonic(), 0))
+    
+    def update(self, headers: httpx.Headers) -> None:
+        """
+        Applies the remaining quota Azure reports for the deployment.
+        
+        Args:
+            headers (httpx.Headers): Response headers of a completed request
+        """
+        
+        now = time.monotonic()
+        
+        requests_left = headers.get("x-ratelimit-remaining-requests", "")
+        if requests_left.isdigit():
+            self._tokens = min(self._tokens, float(requests_left))
+            
+            if requests_left == "0":
+                reset = parse_reset_seconds(headers.get("x-ratelimit-reset-requests"))
+                self._resume_at = max(self._resume_at, now + reset)
+                logger.info("Azure request quota exhausted; holding requests for %.1fs", reset)
+        
+        tokens_left = headers.get("x-ratelimit-remaining-tokens", "")
+        if tokens_left.isdigit():
+            self._tokens_left = int(tokens_left)
+            self._tokens_reset_at = now + parse_reset_seconds(headers.get("x-ratelimit-reset-tokens"))
+
+
+def parse_reset_seconds(value: Optional[str]) -> float:
+    """
+    Parses an x-ratelimit-reset-* header value.
+    
+    Accepts plain seconds (``"12"``) and duration strings (``"1m30s"``,
+    ``"250ms"``).
+    
+    Args:
+        value (Optional[str]): Header value
+        
+    Returns:
+        float: Seconds until the quota resets (RATE_LIMIT_RESET_FALLBACK if unknown)
+    """
+    
+    if not value:
+        return RATE_LIMIT_RESET_FALLBACK
+    
+    # Quotas are per minute, so no reset is further away than that
+    try:
+        return min(max(0.0, float(value)), 60.0)
+    except ValueError:
+        pass
+    
+    parts = _DURATION_PART.findall(value)
+    
+    if not parts or "".join(number + unit for number, unit in parts) != value.strip():
+        return RATE_LIMIT_RESET_FALLBACK
+    
+    return min(sum(float(number) * _DURATION_UNITS[unit] for number, unit in parts), 60.0)
+
+# ============================================================================
+# ASYNC AZURE OPENAI API CALL FUNCTIONS
+# ============================================================================
+
+def create_async_client() -> AsyncAzureOpenAI:
+    """
+    Creates an async Azure OpenAI SDK client from the module configuration.
+    
+    The client owns an HTTP connection pool bound to the running event loop,
+    so create one per batch (``async with create_async_client() as client``)
+    and share it across the concurrent requests of that batch.
+    
+    Returns:
+        AsyncAzureOpenAI: Configured async client
+    """
+    
+    return AsyncAzureOpenAI(
+        api_key=AZURE_API_KEY,
+        azure_endpoint=AZURE_ENDPOINT_URL,
+        api_version=API_VERSION,
+        timeout=REQUEST_TIMEOUT,
+        max_retries=0,
+        http_client=create_async_http_client()
+    )
+
+
+async def async_call_azure_openai(client: AsyncAzureOpenAI, prompt: str,
+                                  max_tokens: Optional[int] = None,
+                                  limiter: Optional[RateLimiter] = None,
+                                  deadline: Optional[float] = None) -> Optional[str]:
+    """
+    Sends the analysis prompt to Azure OpenAI without blocking the event loop.
+    
+    Args:
+        client (AsyncAzureOpenAI): Async client used for the request
+        prompt (str): The analysis prompt to send to Azure OpenAI
+        max_tokens (Optional[int]): Override for the completion token limit
+        limiter (Optional[RateLimiter]): Rate limiter to wait on before sending
+        deadline (Optional[float]): time.monotonic() by which the request must
+            be answered (defaults to REQUEST_TIMEOUT from now)
+        
+    Returns:
+        Optional[str]: The AI-generated analysis response or None on error
+        
+    Raises:
+        PromptTooLargeError: If the prompt does not fit the context window
+        RateLimitTimeoutError: If the rate limit leaves no room before the deadline
+    """
+    
+    try:
+        analysis = "".join([part async for part in async_stream_azure_openai(client, prompt, max_tokens, limiter, deadline)])
+        
+        if analysis:
+            return analysis
+        
+        logger.error("Azure OpenAI stream ended without any content")
         return None
-    except json.JSONDecodeError as e:
-        logger.error("JSON decode error: %s", str(e))
+        
+    except APIError as e:
+        logger.error("Azure OpenAI API error: %s", str(e))
         return None
+    except (PromptTooLargeError, RateLimitTimeoutError):
+        # Nothing was sent; the caller reports the reason
+        raise
     except Exception as e:
-        logger.error("Unexpected error in call_azure_openai: %s", str(e), exc_info=True)
+        logger.error("Unexpected error in async_call_azure_openai: %s", str(e), exc_info=True)
         return None
 
+
+async def async_stream_azure_openai(client: AsyncAzureOpenAI, prompt: str,
+                                    max_tokens: Optional[int] = None,
+                                    limiter: Optional[RateLimiter] = None,
+                                    deadline: Optional[float] = None) -> AsyncIterator[str]:
+    """
+    Streams the analysis from Azure OpenAI through the async SDK client.
+    
+    Args:
+        client (AsyncAzureOpenAI): Async client used for the request
+        prompt (str): The analysis prompt to send to Azure OpenAI
+        max_tokens (Optional[int]): Override for the completion token limit
+        limiter (Optional[RateLimiter]): Rate limiter to wait on before sending
+        deadline (Optional[float]): time.monotonic() by which the request must
+            be answered (defaults to REQUEST_TIMEOUT from now)
+        
+    Yields:
+        str: Successive pieces of the assistant message
+        
+    Raises:
+        openai.APIError: If the request fails
+    """
+    
+    payload = build_chat_payload(prompt, max_tokens)
+    
+    if limiter:
+        await limiter.acquire(count_tokens(prompt) + payload["max_tokens"], deadline)
+    
+    stream = await async_call_sdk_with_retry(
+        lambda timeout: client.chat.completions.create(
+            model=AZURE_DEPLOYMENT_NAME,
+            stream=True,
+            timeout=timeout,
+            **payload
+        ),
+        deadline
+    )
+    
+    if limiter:
+        limiter.update(stream.response.headers)
+    
+    async with stream:
+        async for chunk in stream:
+            # The first chunk may only carry content filter results
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
 # ============================================================================
 # UTILITY FUNCTIONS
 # ============================================================================
 
+def error_response(message: str) -> Dict[str, Any]:
+    """
+    Builds the error response returned to the UI.
+    
+    Args:
+        message (str): Human-readable error message
+        
+    Returns:
+        Dict[str, Any]: Error response
+    """
+    
+    return {
+        "status": "error",
+        "message": message,
+        "analysis": ""
+    }
+
+
+def build_handler_response(analysis_response: Optional[str],
+                           extracted_data: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Builds the handler response for an Azure OpenAI analysis result.
+    
+    Args:
+        analysis_response (Optional[str]): Analysis text, or None if the call failed
+        extracted_data (Dict[str, str]): Extracted detection/incident fields
+        
+    Returns:
+        Dict[str, Any]: Success response, or error response if no analysis
+    """
+    
+    if not analysis_response:
+        return error_response("Failed to get response from Azure OpenAI")
+    
+    logger.info("Analysis response received: %s", analysis_response)
+    
+    return {
+        "status": "success",
+        "message": "Analysis completed successfully",
+        "analysis": analysis_response,
+        "extracted_data": extracted_data
+    }
+
+
+def get_event_mode(event: Dict[str, Any]) -> str:
+    """
+    Resolves which _EVENT_HANDLERS entry handles an event.
+    
+    An explicit, known ``mode`` wins; otherwise the ``priority`` decides
+    (``"bulk"`` goes to the Batch API), an ``events`` list is analyzed
+    concurrently, and everything else is real-time.
+    
+    Args:
+        event (Dict[str, Any]): Handler payload
+        
+    Returns:
+        str: Event mode
+    """
+    
+    mode = event.get("mode")
+    
+    if isinstance(mode, str) and mode in _EVENT_HANDLERS:
+        return mode
+    
+    priority = event.get("priority")
+    
+    if isinstance(priority, str) and priority in _PRIORITY_MODES:
+        return _PRIORITY_MODES[priority]
+    
+    return "concurrent" if isinstance(event.get("events"), list) else "realtime"
+
+
+def strip_routing_keys(event: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Removes handler control keys so they are not read as detection fields.
+    
+    ``priority`` doubles as a severity fallback, so it is only removed when
+    its value is a routing tag (e.g. ``"bulk"``).
+    
+    Args:
+        event (Dict[str, Any]): Handler payload
+        
+    Returns:
+        Dict[str, Any]: The payload without routing keys (the same dict if it has none)
+    """
+    
+    priority = event.get("priority")
+    routing_priority = isinstance(priority, str) and priority in _PRIORITY_MODES
+    
+    if not routing_priority and not any(key in event for key in _ROUTING_KEYS):
+        return event
+    
+    return {
+        key: value for key, value in event.items()
+        if key not in _ROUTING_KEYS and not (key == "priority" and routing_priority)
+    }
+
+
+def get_max_tokens_override(event: Dict[str, Any]) -> Optional[int]:
+    """
+    Reads the optional per-event completion token limit.
+    
+    Args:
+        event (Dict[str, Any]): Detection/Incident payload
+        
+    Returns:
+        Optional[int]: The requested limit, or None to use the default
+        
+    Raises:
+        ValueError: If ``max_tokens`` is present but not a positive integer
+    """
+    
+    max_tokens = event.get("max_tokens")
+    
+    if max_tokens is None:
+        return None
+    
+    if isinstance(max_tokens, bool) or not isinstance(max_tokens, int) or max_tokens <= 0:
+        raise ValueError("max_tokens must be a positive integer")
+    
+    return max_tokens
+
+
 def validate_azure_config() -> bool:
     """
     Validates that Azure OpenAI credentials are properly configured.
@@ -330,6 +2162,30 @@ def validate_azure_config() -> bool:
     
     return True
 
+
+def warm_up() -> None:
+    """
+    Opens the HTTP/2 connection to Azure OpenAI ahead of the first request.
+    
+    Sends a 1-token completion through the shared client so the TLS handshake,
+    and the token encoding load in build_chat_payload, happen outside the
+    user-facing request path. Failures are logged and otherwise ignored.
+    """
+    
+    try:
+        response = _CLIENT.post(_API_URL, headers=_HEADERS, content=orjson.dumps(build_chat_payload("ping", 1)))
+        logger.info("Warm-up request completed with status %s", response.status_code)
+    except httpx.HTTPError as e:
+        logger.error("Warm-up request failed: %s", e)
+
+
+# Fail at import rather than letting every request time out against a bad configuration
+if not validate_azure_config():
+    raise RuntimeError("Azure OpenAI is not configured: set AZURE_OPENAI_API_KEY (see CREDENTIALS_SETUP.md)")
+
+if WARMUP_ON_IMPORT:
+    threading.Thread(target=warm_up, name="azure-warmup", daemon=True).start()
+
 # ============================================================================
 # ENTRY POINT
 # ============================================================================
@@ -347,4 +2203,4 @@ if __name__ == "__main__":
     }
     
     result = handler(test_event)
-    print(json.dumps(result, indent=2))
+    print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())